@@ -2,12 +2,82 @@
 Tic Tac Toe Player
 """
 
-import math, copy
+import math
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Packed board used by the search: cell (i, j) is the base-3 digit 3 * i + j
+# of a single int, holding one of the digits below
+PACKED_EMPTY = 0
+PACKED_X = 1
+PACKED_O = 2
+PACKED_PLAYERS = {X: PACKED_X, O: PACKED_O}
+PACKED_COLORS = {1: PACKED_X, -1: PACKED_O}
+POW3 = tuple(3**index for index in range(9))
+CELLS = tuple((i, j) for i in range(3) for j in range(3))
+LINES = (
+    (0, 1, 2),
+    (3, 4, 5),
+    (6, 7, 8),
+    (0, 3, 6),
+    (1, 4, 7),
+    (2, 5, 8),
+    (0, 4, 8),
+    (2, 4, 6),
+)
+# Digits of every packed row of three cells
+ROW_DIGITS = tuple((row % 3, row // 3 % 3, row // 9) for row in range(27))
+# The eight rotations and reflections of the board, each mapping a cell
+# index to the index that cell moves to
+SYMMETRIES = tuple(
+    tuple(3 * row + col for row, col in (transform(i, j) for i, j in CELLS))
+    for transform in (
+        lambda i, j: (i, j),
+        lambda i, j: (j, 2 - i),
+        lambda i, j: (2 - i, 2 - j),
+        lambda i, j: (2 - j, i),
+        lambda i, j: (i, 2 - j),
+        lambda i, j: (j, i),
+        lambda i, j: (2 - i, j),
+        lambda i, j: (2 - j, 2 - i),
+    )
+)
+INVERSE_SYMMETRIES = tuple(
+    tuple(symmetry.index(index) for index in range(9)) for symmetry in SYMMETRIES
+)
+# For each symmetry, row and packed row value, what that row adds to the
+# transformed packed board
+SYMMETRY_ROW_VALUES = tuple(
+    tuple(
+        tuple(
+            sum(
+                digit * POW3[symmetry[3 * row + col]]
+                for col, digit in enumerate(ROW_DIGITS[row_value])
+            )
+            for row_value in range(27)
+        )
+        for row in range(3)
+    )
+    for symmetry in SYMMETRIES
+)
+# Boards with fewer empty cells than this are keyed by their packed value,
+# because their subtrees are too small to pay for canonical_board
+SYMMETRY_MIN_EMPTY_CELLS = 5
+# Cells tried first by the search: center, then corners, then edges
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+# Transposition table flags: stored value is exact, a lower bound or an upper bound
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Maps a canonical board to (value, flag, best move) for positions already
+# searched, with the value seen from the player to move and the best move
+# given in canonical cell indexes
+transposition_table = {}
+
 
 def initial_state():
     """
@@ -43,11 +113,11 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    if action not in actions(board):
+    (row, column) = action
+    if row not in range(3) or column not in range(3) or board[row][column] != EMPTY:
         raise ValueError("action not possible")
 
-    (row, column) = action
-    resulting_board = copy.deepcopy(board)
+    resulting_board = [list(cells) for cells in board]
     resulting_board[row][column] = player(board)
     return resulting_board
 
@@ -56,22 +126,11 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    rows = board
-    cols = [list(col) for col in zip(*board)]
-    diag1 = [board[i][i] for i in range(3)]
-    diag2 = [board[i][2 - i] for i in range(3)]
-    lines = rows + cols + [diag1] + [diag2]
-    for line in lines:
-        player = are_all_cells_same_player(line)
-        if player is not None:
-            return player
-    return None
-
-
-def are_all_cells_same_player(cels):
-    winner_player = set(cels)
-    if len(winner_player) == 1 and None not in winner_player:
-        return winner_player.pop()
+    cells = [cell for row in board for cell in row]
+    for a, b, c in LINES:
+        line_player = cells[a]
+        if line_player is not None and line_player == cells[b] == cells[c]:
+            return line_player
     return None
 
 
@@ -79,72 +138,186 @@ def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    return True if winner(board) or not actions(board) else False
+    return evaluate(board) is not None
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
-        return 1
-    if winner(board) == O:
-        return -1
-    return 0
+    value = evaluate(board)
+    return 0 if value is None else value
+
+
+def evaluate(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 on a tie
+    and None if the game is not over yet.
+    """
+    return packed_evaluate(packed_digits(pack(board)))
 
 
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if terminal(board):
+    packed_board = pack(board)
+    digits = packed_digits(packed_board)
+    if packed_evaluate(digits) is not None:
         return None
-    current_player = player(board)
+    transposition_table.clear()
+    color = 1 if digits.count(PACKED_O) >= digits.count(PACKED_X) else -1
+    packed_player = PACKED_COLORS[color]
     chosen_action = (0, 0)
     alpha = float("-inf")
     beta = float("inf")
-    if current_player == X:
-        value = float("-inf")
-    else:
-        value = float("inf")
-
-    for action in actions(board):
-        new_board = result(board, action)
-        if current_player == X:
-            new_value = minValue(new_board, alpha, beta)
-            alpha = max(alpha, new_value)
-            if new_value > value:
-                value = new_value
-                chosen_action = action
-        if current_player == O:
-            new_value = maxValue(new_board, alpha, beta)
-            beta = min(beta, new_value)
-            if new_value < value:
-                value = new_value
-                chosen_action = action
+    value = float("-inf")
+
+    for index in packed_actions(digits):
+        new_board = packed_result(packed_board, index, packed_player)
+        new_value = -negamax(new_board, -beta, -alpha, -color)
+        if new_value > value:
+            value = new_value
+            chosen_action = CELLS[index]
+        alpha = max(alpha, value)
 
     return chosen_action
 
 
-def maxValue(board, alpha, beta):
-    if terminal(board):
-        return utility(board)
+def negamax(board, alpha, beta, color):
+    """
+    Returns the value of the board for the player to move, where color
+    is 1 if X is to move and -1 if O is.
+    """
+    digits = packed_digits(board)
+    if digits.count(PACKED_EMPTY) >= SYMMETRY_MIN_EMPTY_CELLS:
+        key, symmetry = canonical_board(board)
+    else:
+        key, symmetry = board, 0
+    entry = transposition_table.get(key)
+    cached = lookup_transposition(entry, alpha, beta)
+    if cached is not None:
+        return cached
+    value = packed_evaluate(digits)
+    if value is not None:
+        value = color * value
+        transposition_table[key] = (value, EXACT, None)
+        return value
+    original_alpha = alpha
+    packed_player = PACKED_COLORS[color]
     value = float("-inf")
-    for action in actions(board):
-        value = max(value, minValue(result(board, action), alpha, beta))
+    best_move = None
+    for index in ordered_actions(digits, entry, symmetry):
+        new_board = packed_result(board, index, packed_player)
+        new_value = -negamax(new_board, -beta, -alpha, -color)
+        if new_value > value:
+            value = new_value
+            best_move = index
         alpha = max(alpha, value)
-        if value >= beta:
-            return value
+        if alpha >= beta:
+            break
+    canonical_move = SYMMETRIES[symmetry][best_move]
+    store_transposition(key, value, original_alpha, beta, canonical_move)
     return value
 
 
-def minValue(board, alpha, beta):
-    if terminal(board):
-        return utility(board)
-    value = float("inf")
-    for action in actions(board):
-        value = min(value, maxValue(result(board, action), alpha, beta))
-        beta = min(beta, value)
-        if value <= alpha:
-            return value
-    return value
+def pack(board):
+    """
+    Returns the packed int representation of a list board.
+    """
+    packed_board = 0
+    for index, (i, j) in enumerate(CELLS):
+        if board[i][j] != EMPTY:
+            packed_board += PACKED_PLAYERS[board[i][j]] * POW3[index]
+    return packed_board
+
+
+def packed_digits(packed_board):
+    """
+    Returns the nine base-3 digits of a packed board as a tuple,
+    looked up three cells at a time.
+    """
+    return (
+        ROW_DIGITS[packed_board % 27]
+        + ROW_DIGITS[packed_board // 27 % 27]
+        + ROW_DIGITS[packed_board // 729]
+    )
+
+
+def packed_actions(digits):
+    return [index for index in MOVE_ORDER if digits[index] == PACKED_EMPTY]
+
+
+def ordered_actions(digits, entry, symmetry):
+    """
+    Returns the packed actions, trying the best move stored
+    in the transposition table entry first.
+    """
+    indexes = packed_actions(digits)
+    if entry is not None and entry[2] is not None:
+        best_move = INVERSE_SYMMETRIES[symmetry][entry[2]]
+        indexes.remove(best_move)
+        indexes.insert(0, best_move)
+    return indexes
+
+
+def canonical_board(packed_board):
+    """
+    Returns the smallest packed board among the rotations and reflections
+    of packed_board, and the index of the symmetry that produces it.
+    """
+    rows = (packed_board % 27, packed_board // 27 % 27, packed_board // 729)
+    return min(
+        (values[0][rows[0]] + values[1][rows[1]] + values[2][rows[2]], index)
+        for index, values in enumerate(SYMMETRY_ROW_VALUES)
+    )
+
+
+def packed_result(packed_board, index, packed_player):
+    return packed_board + packed_player * POW3[index]
+
+
+def packed_winner(digits):
+    for a, b, c in LINES:
+        line_player = digits[a]
+        if line_player != PACKED_EMPTY and line_player == digits[b] == digits[c]:
+            return line_player
+    return None
+
+
+def packed_evaluate(digits):
+    packed_winner_player = packed_winner(digits)
+    if packed_winner_player == PACKED_X:
+        return 1
+    if packed_winner_player == PACKED_O:
+        return -1
+    if PACKED_EMPTY in digits:
+        return None
+    return 0
+
+
+def lookup_transposition(entry, alpha, beta):
+    """
+    Returns the value stored in a transposition table entry if it
+    settles the search within the (alpha, beta) window, None otherwise.
+    """
+    if entry is None:
+        return None
+    value, flag, _ = entry
+    if flag == EXACT:
+        return value
+    if flag == LOWER and value >= beta:
+        return value
+    if flag == UPPER and value <= alpha:
+        return value
+    return None
+
+
+def store_transposition(key, value, alpha, beta, best_move):
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    transposition_table[key] = (value, flag, best_move)
@@ -1,3 +1,4 @@
+import collections
 import itertools
 import random
 
@@ -96,9 +97,18 @@ class Sentence:
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        return hash(self.key())
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable snapshot of the sentence's current content.
+        """
+        return (frozenset(self.cells), self.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -148,6 +158,7 @@ class MinesweeperAI:
         # Keep track of which cells have been clicked on
         self.moves_made = set()
         self.all_moves = self.calculate_all_moves()
+        self.neighbours = self.calculate_neighbours()
 
         # Keep track of cells known to be safe or mines
         self.mines = set()
@@ -156,23 +167,39 @@ class MinesweeperAI:
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Sentences in self.knowledge that contain each cell
+        self.cell_index = {}
+
+        # Content keys of the sentences in self.knowledge, to skip duplicates
+        self.sentence_keys = set()
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
+        Returns the sentences that changed.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        changed_sentences = self.cell_index.pop(cell, [])
+        for sentence in changed_sentences:
+            self.sentence_keys.discard(sentence.key())
             sentence.mark_mine(cell)
+            self.rekey_sentence(sentence)
+        return changed_sentences
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
+        Returns the sentences that changed.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        changed_sentences = self.cell_index.pop(cell, [])
+        for sentence in changed_sentences:
+            self.sentence_keys.discard(sentence.key())
             sentence.mark_safe(cell)
+            self.rekey_sentence(sentence)
+        return changed_sentences
 
     def add_knowledge(self, cell, count):
         """
@@ -190,64 +217,52 @@ class MinesweeperAI:
                if they can be inferred from existing knowledge
         """
         self.moves_made.add(cell)
-        self.mark_safe(cell)
+        changed_sentences = self.mark_safe(cell)
         unknown_neighbours = self.get_unknown_neighbours(cell)
         new_knowledge = Sentence(unknown_neighbours, count)
-        self.knowledge.append(new_knowledge)
         mines_in_new_knowledge = new_knowledge.cells.intersection(self.mines)
         for mine in mines_in_new_knowledge:
-            self.mark_mine(mine)
+            new_knowledge.mark_mine(mine)
+        new_key = new_knowledge.key()
+        if new_knowledge.cells and new_key not in self.sentence_keys:
+            self.sentence_keys.add(new_key)
+            self.knowledge.append(new_knowledge)
+            for neighbour in new_knowledge.cells:
+                self.cell_index.setdefault(neighbour, []).append(new_knowledge)
+            changed_sentences.append(new_knowledge)
+
+        self.reason_about_new_knowledge(changed_sentences)
+
+    def reason_about_new_knowledge(self, changed_sentences):
+        """
+        Propagates the changed sentences through the knowledge base
+        until no more cells can be marked and no more subsets removed.
+        """
+        dirty = collections.deque(changed_sentences)
+        while dirty:
+            sentence = dirty.popleft()
+            if len(sentence.cells) == 0:
+                continue
 
-        self.reason_about_new_knowledge(new_knowledge)
+            if sentence.count == 0:
+                for safe in list(sentence.cells):
+                    dirty.extend(self.mark_safe(safe))
+                continue
+            if sentence.count == len(sentence.cells):
+                for mine in list(sentence.cells):
+                    dirty.extend(self.mark_mine(mine))
+                continue
 
-    def reason_about_new_knowledge(self, new_knowledge):
-        added_knowledge = True
-        if len(new_knowledge.cells) == 0:
-            return
+            for existing_knowledge in self.overlapping_sentences(sentence):
+                if existing_knowledge.cells < sentence.cells:
+                    self.subtract_sentence(sentence, existing_knowledge)
+                    dirty.append(sentence)
+                    break
+                if existing_knowledge.cells > sentence.cells:
+                    self.subtract_sentence(existing_knowledge, sentence)
+                    dirty.append(existing_knowledge)
 
-        while added_knowledge:
-            added_knowledge = False
-            self.clean_up_empty_knowledge()
-            known_safes = set()
-            known_mines = set()
-
-            previous_safes_count = len(self.safes)
-            previous_mines_count = len(self.mines)
-
-            for sentence in self.knowledge:
-                for mine in sentence.known_mines():
-                    known_mines.add(mine)
-                for safe in sentence.known_safes():
-                    known_safes.add(safe)
-
-            for mine in known_mines:
-                self.mark_mine(mine)
-            for safe in known_safes:
-                self.mark_safe(safe)
-
-            new_safes_count = len(self.safes)
-            new_mines_count = len(self.mines)
-
-            if (
-                previous_safes_count != new_safes_count
-                or previous_mines_count != new_mines_count
-            ):
-                added_knowledge = True
-
-        for existing_knowledge in self.knowledge:
-            added_knowledge = False
-            if len(existing_knowledge.cells) == 0:
-                self.clean_up_empty_knowledge()
-                continue
-            if (
-                existing_knowledge.cells.issuperset(new_knowledge.cells)
-                and existing_knowledge.cells != new_knowledge.cells
-            ):
-                existing_knowledge.cells.difference_update(new_knowledge.cells)
-                existing_knowledge.count -= new_knowledge.count
-                added_knowledge = True
-            if added_knowledge:
-                self.reason_about_new_knowledge(existing_knowledge)
+        self.clean_up_empty_knowledge()
 
     def make_safe_move(self):
         """
@@ -278,17 +293,7 @@ class MinesweeperAI:
         return None
 
     def get_unknown_neighbours(self, cell):
-        neighbours = set()
-        row, col = cell
-        for i in range(row - 1, row + 2):
-            if i < 0 or i >= self.height:
-                continue
-            for j in range(col - 1, col + 2):
-                if j < 0 or j >= self.width:
-                    continue
-                if (i, j) not in self.safes:  # and (i, j) not in self.mines:
-                    neighbours.add((i, j))
-        return neighbours
+        return self.neighbours[cell] - self.safes
 
     def calculate_all_moves(self):
         all_moves = set()
@@ -297,14 +302,64 @@ class MinesweeperAI:
                 all_moves.add((i, j))
         return all_moves
 
+    def calculate_neighbours(self):
+        neighbours = dict()
+        for i, j in self.all_moves:
+            neighbours[(i, j)] = frozenset(
+                (row, col)
+                for row in range(i - 1, i + 2)
+                for col in range(j - 1, j + 2)
+                if 0 <= row < self.height
+                and 0 <= col < self.width
+                and (row, col) != (i, j)
+            )
+        return neighbours
+
+    def overlapping_sentences(self, sentence):
+        """
+        Returns the other sentences that share at least one cell with sentence.
+        """
+        overlapping = {}
+        for cell in sentence.cells:
+            for other in self.cell_index[cell]:
+                if other is not sentence:
+                    overlapping[id(other)] = other
+        return list(overlapping.values())
+
+    def subtract_sentence(self, sentence, subset):
+        """
+        Removes the cells and mines of subset from sentence,
+        keeping the cell index up to date.
+        """
+        self.sentence_keys.discard(sentence.key())
+        self.unindex_sentence(sentence, subset.cells)
+        sentence.cells.difference_update(subset.cells)
+        sentence.count -= subset.count
+        self.rekey_sentence(sentence)
+
+    def rekey_sentence(self, sentence):
+        """
+        Records the content of a changed sentence, emptying it instead
+        if an equal sentence is already known.
+        """
+        if not sentence.cells:
+            return
+        key = sentence.key()
+        if key in self.sentence_keys:
+            self.unindex_sentence(sentence, sentence.cells)
+            sentence.cells.clear()
+            sentence.count = 0
+        else:
+            self.sentence_keys.add(key)
+
+    def unindex_sentence(self, sentence, cells):
+        for cell in cells:
+            self.cell_index[cell] = [
+                other for other in self.cell_index[cell] if other is not sentence
+            ]
+
     def clean_up_empty_knowledge(self):
-        sentences_to_clean = []
-        for i in range(0, len(self.knowledge)):
-            if len(self.knowledge[i].cells) == 0:
-                sentences_to_clean.append(i)
-        sentences_to_clean.reverse()
-        for i in sentences_to_clean:
-            self.knowledge.pop(i)
+        self.knowledge = [sentence for sentence in self.knowledge if sentence.cells]
 
     def check_if_sentence_has_known_mines(self, sentence):
         known_mines_in_sentence = self.mines.intersection(sentence.cells)
@@ -1,3 +1,4 @@
+import itertools
 import os
 import random
 import re
@@ -5,6 +6,7 @@ import sys
 
 DAMPING = 0.85
 SAMPLES = 10000
+LINK_PATTERN = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
 
 
 def main():
@@ -30,13 +32,14 @@ def crawl(directory):
     pages = dict()
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".html"):
+                continue
+            with open(entry.path) as f:
+                contents = f.read()
+                links = LINK_PATTERN.findall(contents)
+                pages[entry.name] = set(links) - {entry.name}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -67,8 +70,6 @@ def transition_model(corpus, page, damping_factor):
 def create_model_for_page_with_no_links(corpus):
     chance = 1 / len(corpus)
     model = dict.fromkeys(corpus, chance)
-
-    model = adjust_dict_rounding(model)
     return model
 
 
@@ -80,19 +81,12 @@ def create_regular_model(corpus, links, damping_factor):
     for link in links:
         model[link] += non_damping_chance
 
-    model = adjust_dict_rounding(model)
     return model
 
 
-def adjust_dict_rounding(model):
-    total = 0
-    for value in model.values():
-        total += value
-    if total != 1:
-        difference = 1 - total
-        first_key = next(iter(model))
-        model[first_key] += difference
-    return model
+def normalize_ranks(ranks):
+    total = sum(ranks.values())
+    return {page: rank / total for page, rank in ranks.items()}
 
 
 def sample_pagerank(corpus, damping_factor, n):
@@ -107,22 +101,24 @@ def sample_pagerank(corpus, damping_factor, n):
     result = dict.fromkeys(corpus, 0)
     choice_weight = 1 / n
 
+    # Transition model of every page as parallel lists of pages and cumulative chances
+    cumulative_models = dict()
+    for page in corpus:
+        model = transition_model(corpus, page, damping_factor)
+        cumulative_models[page] = (
+            list(model.keys()),
+            list(itertools.accumulate(model.values())),
+        )
+
     page = random.choice(list(corpus.keys()))
     result[page] += choice_weight
 
     for _ in range(0, n - 1):
-        # find next page
-        model = transition_model(corpus, page, damping_factor)
-        next_page_chance = random.random()
-        total_chance = 0
-        for key, value in model.items():
-            total_chance += value
-            if total_chance >= next_page_chance:
-                page = key
-                result[page] += choice_weight
-                break
+        pages, cumulative_chances = cumulative_models[page]
+        page = random.choices(pages, cum_weights=cumulative_chances)[0]
+        result[page] += choice_weight
 
-    return result
+    return normalize_ranks(result)
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -139,25 +135,37 @@ def iterate_pagerank(corpus, damping_factor):
 
     result = dict.fromkeys(corpus, 1 / n)
     damping_chance = (1 - damping_factor) / n
+    incoming_links = create_incoming_links(corpus)
+    pages_with_no_links = [page for page, links in corpus.items() if not links]
     difference_factor = float("inf")
     while difference_factor > CHANGE_THRESHOLD:
-        difference_factor = float("-inf")
-        for page in corpus:
-            incoming_sum = 0
-            for key, value in corpus.items():
-                if not value:
-                    # Empty set, page with no links
-                    incoming_sum += result[key] / len(corpus)
-                if page in value:
-                    incoming_sum += result[key] / len(value)
-            new_page_rank = damping_chance + damping_factor * incoming_sum
-            new_page_rank_difference = abs(result[page] - new_page_rank)
-            result[page] = new_page_rank
-            if new_page_rank_difference > difference_factor:
-                difference_factor = new_page_rank_difference
-        result = adjust_dict_rounding(result)
-
-    return result
+        # Pages with no links spread their rank evenly over the whole corpus
+        no_links_sum = sum(result[page] for page in pages_with_no_links) / n
+        new_result = dict()
+        for page, links in incoming_links.items():
+            incoming_sum = no_links_sum
+            for linking_page, chance in links:
+                incoming_sum += result[linking_page] * chance
+            new_result[page] = damping_chance + damping_factor * incoming_sum
+        difference_factor = max(abs(new_result[page] - result[page]) for page in corpus)
+        result = new_result
+
+    return normalize_ranks(result)
+
+
+def create_incoming_links(corpus):
+    """
+    Return a dictionary where each key is a page, and values are
+    a list of (linking page, chance of following the link) pairs.
+    """
+    incoming_links = {page: [] for page in corpus}
+    for page, links in corpus.items():
+        if not links:
+            continue
+        chance = 1 / len(links)
+        for link in links:
+            incoming_links[link].append((page, chance))
+    return incoming_links
 
 
 if __name__ == "__main__":